@@ -1,11 +1,27 @@
 """Function for extracting counts."""
-from typing import Any
+from fractions import Fraction
+from math import gcd
+import os
+import sys
+from typing import Any, Dict, Tuple
 
 import numpy as np
 from numpy import typing as npt
 from scipy import signal
 import pandas as pd
-import gc
+
+try:
+    from numba import njit, prange
+
+    _HAS_NUMBA = True
+except ImportError:  # numba is optional, fall back to scipy
+    _HAS_NUMBA = False
+
+# Directory holding extract_reference.py. __file__ is not always set when
+# this file is run with reticulate::py_run_file.
+_INST_DIR = (
+    os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else None
+)
 
 # BPF. There are extraneous coefficients as to match constants
 # in ActiLife.
@@ -43,204 +59,128 @@ OUTPUT_COEFFICIENTS: npt.NDArray[np.float_] = np.array(
     ]
 )
 
-
-def _factors(frequency: int):
-    if frequency == 30:
-        upsample_factor, downsample_factor = 1, 1
-    elif frequency == 40:
-        upsample_factor, downsample_factor = 3, 4
-    elif frequency == 50:
-        upsample_factor, downsample_factor = 3, 5
-    elif frequency == 60:
-        upsample_factor, downsample_factor = 1, 2
-    elif frequency == 70:
-        upsample_factor, downsample_factor = 3, 7
-    elif frequency == 80:
-        upsample_factor, downsample_factor = 3, 8
-    elif frequency == 90:
-        upsample_factor, downsample_factor = 1, 3
-    elif frequency == 100:
-        upsample_factor, downsample_factor = 3, 10
-    else:
-        upsample_factor, downsample_factor = 1, 1
-    return upsample_factor, downsample_factor
-
-
-def _extract_slow(
-    raw: npt.NDArray[np.float_],
-    frequency: int,
-    lfe_select: bool,
-    epoch: int,
-    verbose: bool,
-):
-    """Extract actigraphy counts from one-dimensional accelerometer data.
-
-    This implementation is purposefully only using basic python function to allow
-    easier understanding of the algorithm.
-
-    Parameters
-    ----------
-    raw
-        1D matrix containing raw data
-    frequency
-        sample frequency of raw data (Hz)
-    lfe_select
-        False for regular trimming (LFE disabled), True to allow more noise
-        (LFE enabled)
-    epoch
-        Epoch duration in seconds
-
-    Returns
-    -------
-    ndarray containing epoch counts
-    """
-    upsample_factor, downsample_factor = _factors(frequency)
-    raw = np.transpose(raw)
-    # Allocate memory and upsample by factor L.
-    upsample_data = np.zeros((1, int(len(raw[0]) * upsample_factor)))
-
-    for i in range(len(raw[0])):
-        upsample_data[0, i * upsample_factor] = raw[0, i]
-
-    # Allocate memory and then LPF.  LPF is only done at non integer multiples of 30 Hz.
-    # This LPF is garbage and does a poor job of attenuating higher frequencies that
-    # need to be rejected.  This is the reason why there is aliasing which causes the
-    # "tail" on the epochs.
-
-    # lpf_upsample_data = np.zeros((1, len(upsample_data[0])))
-    if frequency not in [30, 60, 90]:
-        lpf_upsample_data = np.zeros((1, int(len(raw[0]) * upsample_factor + 1)))
-
-    pi = np.pi  # 3.1415926535897932385
-    pi_fp = pi
-    a_fp = pi_fp / (pi + 2 * upsample_factor)
-    b_fp = (pi - 2 * upsample_factor) / (pi + 2 * upsample_factor)
-    l_fp = upsample_factor
-
-    if verbose:
-        print("Upsampling data", flush = True)
-    if frequency == 30 or frequency == 60 or frequency == 90:
-        lpf_upsample_data = upsample_data
-    else:
-        for i in range(1, len(lpf_upsample_data[0])):
-            lpf_upsample_data[0, i] = (
-                (a_fp * l_fp) * upsample_data[0, i - 1]
-                + (a_fp * l_fp) * upsample_data[0, i - 2]
-                - b_fp * lpf_upsample_data[0, i - 1]
+# Up/downsample factors (L, M) taking each supported frequency to 30 Hz,
+# i.e. 30 / frequency in lowest terms.
+_FACTORS: Dict[int, Tuple[int, int]] = {
+    frequency: (30 // gcd(30, frequency), frequency // gcd(30, frequency))
+    for frequency in range(30, 101, 10)
+}
+_FACTORS_RATIONAL: Dict[int, Fraction] = {
+    frequency: Fraction(*factors) for frequency, factors in _FACTORS.items()
+}
+
+# 17.127404 is used in ActiLife and 17.128125 is used in firmware.
+BPF_GAIN = (3.0 / 4096.0) / (2.6 / 256.0) * 237.5
+
+# Normalized BPF coefficients, with the gain folded into the numerator.
+_A_NORM = INPUT_COEFFICIENTS[0] * BPF_GAIN / OUTPUT_COEFFICIENTS[0, 0]
+_B_NORM = OUTPUT_COEFFICIENTS[0] / OUTPUT_COEFFICIENTS[0, 0]
+# Steady state of the BPF for a unit step, scaled per axis by its first sample.
+_ZI = signal.lfilter_zi(_A_NORM, _B_NORM).reshape((1, -1))
+# Scalar copies of the normalized coefficients for _iir9_unrolled.
+_A0, _A1, _A2, _A3, _A4, _A5, _A6, _A7, _A8 = (float(v) for v in _A_NORM)
+_B1, _B2, _B3, _B4, _B5, _B6, _B7, _B8 = (float(v) for v in _B_NORM[1:])
+
+
+if _HAS_NUMBA:
+
+    @njit(fastmath=True)
+    def _iir9_unrolled(x, out, z0, z1, z2, z3, z4, z5, z6, z7):
+        """Run the 9 tap BPF over x into out (transposed direct form II).
+
+        The coefficients are module level scalars, which numba compiles in as
+        constants, and the 8 filter states are locals so they stay in
+        registers.
+        """
+        for n in range(x.size):
+            xn = x[n]
+            y = _A0 * xn + z0
+            z0 = _A1 * xn - _B1 * y + z1
+            z1 = _A2 * xn - _B2 * y + z2
+            z2 = _A3 * xn - _B3 * y + z3
+            z3 = _A4 * xn - _B4 * y + z4
+            z4 = _A5 * xn - _B5 * y + z5
+            z5 = _A6 * xn - _B6 * y + z6
+            z6 = _A7 * xn - _B7 * y + z7
+            z7 = _A8 * xn - _B8 * y
+            out[n] = y
+
+    @njit(parallel=True, fastmath=True)
+    def _iir9(x, zi):
+        """Run the 9 tap BPF over each row of x, starting from zi."""
+        out = np.empty_like(x)
+        for c in prange(x.shape[0]):
+            _iir9_unrolled(
+                x[c],
+                out[c],
+                zi[c, 0],
+                zi[c, 1],
+                zi[c, 2],
+                zi[c, 3],
+                zi[c, 4],
+                zi[c, 5],
+                zi[c, 6],
+                zi[c, 7],
             )
-
-    if frequency not in [30, 60, 90]:
-        lpf_upsample_data = lpf_upsample_data[:, 1:]
-
-    # Then allocate memory and downsample by factor M.  Downsampled data is rounded to 3
-    # decimal places before input into BPF.
-
-    if verbose:
-        print("Downsampling data", flush = True)
-    if frequency == 30:
-        down_sample_data = raw
-    else:
-        down_sample_data = np.zeros(
-            (1, int(np.floor(len(raw[0]) * upsample_factor / downsample_factor)))
-        )
-        for i in range(len(down_sample_data[0])):
-            down_sample_data[0, i] = lpf_upsample_data[0, i * downsample_factor]
-    del raw
-    gc.collect()
-    del lpf_upsample_data
-    gc.collect()
-    
-    down_sample_data = np.round(down_sample_data * 1000) / 1000
-
-    bpf_data = np.zeros((1, len(down_sample_data[0])))
-
-    shift_reg_in = np.zeros((1, 9))
-    shift_reg_out = np.zeros((1, 9))
-
-    if verbose:
-        print("Filtering data", flush = True)
-    for _ in range(180 * 6):  # charge filter up to steady state
-        shift_reg_in[[0], 1:9] = shift_reg_in[[0], 0 : (9 - 1)]
-        shift_reg_in[0, 0] = down_sample_data[0, 0]
-        zeros_comp = np.sum(INPUT_COEFFICIENTS[[0], 0:8] * shift_reg_in[[0], 0:8])
-        poles_comp = np.sum(OUTPUT_COEFFICIENTS[[0], 1:8] * shift_reg_out[[0], 0:7])
-        bpf_data[0, 0] = zeros_comp - poles_comp
-        shift_reg_out[[0], 1:9] = shift_reg_out[[0], 0 : (9 - 1)]
-        shift_reg_out[0, 0] = zeros_comp - poles_comp
-
-    for j in range(len(bpf_data[0])):
-        shift_reg_in[[0], 1:9] = shift_reg_in[[0], 0:8]
-        shift_reg_in[0, 0] = down_sample_data[0, j]
-        zeros_comp = np.sum(INPUT_COEFFICIENTS[[0], 0:8] * shift_reg_in[[0], 0:8])
-        poles_comp = np.sum(OUTPUT_COEFFICIENTS[[0], 1:8] * shift_reg_out[[0], 0:7])
-        bpf_data[0, j] = zeros_comp - poles_comp
-        shift_reg_out[[0], 1:9] = shift_reg_out[[0], 0 : (9 - 1)]
-        shift_reg_out[0, 0] = zeros_comp - poles_comp
-    del down_sample_data
-    gc.collect()
-
-
-    bpf_data = (
-        (3.0 / 4096.0) / (2.6 / 256.0) * 237.5
-    ) * bpf_data  # 17.127404 is used in ActiLife and 17.128125 is used in firmware.
-
-    if verbose:
-        print("Threshold/trimming data", flush = True)
-    # then threshold/trim
-    trim_data = np.zeros((1, len(bpf_data[0])))
-
-    if lfe_select:
-        min_count = 1
-        max_count = 128 * 1
-
-        for i in range(len(bpf_data[0])):
-            if abs(bpf_data[0, i]) > max_count:
-                trim_data[0, i] = max_count
-            elif abs(bpf_data[0, i]) < min_count:
-                trim_data[0, i] = 0
-            elif abs(bpf_data[0, i]) < 4:
-                trim_data[0, i] = np.floor(abs(bpf_data[0, i])) - 1
-            else:
-                trim_data[0, i] = np.floor(abs(bpf_data[0, i]))  # floor
-    else:
-        min_count = 4
-        max_count = 128
-
-        for i in range(len(bpf_data[0])):
-            if abs(bpf_data[0, i]) > max_count:
-                trim_data[0, i] = max_count
-            elif abs(bpf_data[0, i]) < min_count:
-                trim_data[0, i] = 0
-            else:
-                trim_data[0, i] = np.floor(abs(bpf_data[0, i]))  # floor
-
-    if verbose:
-        print("Getting data back to 10Hz for accumulation", flush = True)
-    del bpf_data
-    gc.collect()
-    # hackish downsample to 10 Hz
-    down_sample10_hz = np.zeros((1, int(len(trim_data[0]) / 3)))
-
-    for y in range(1, len(down_sample10_hz[0]) + 1):
-        down_sample10_hz[0, y - 1] = np.floor(
-            np.nanmean(trim_data[0, ((y - 1) * 3) : ((y - 1) * 3 + 3)])
-        )  # floor
-    del trim_data
-    gc.collect()
-
-    # Accumulator for epoch
-    block_size = epoch * 10
-    epoch_counts = np.zeros((1, int((len(down_sample10_hz[0]) / block_size))))
-
-    if verbose:
-        print("Summing epochs", flush = True)
-    for i in range(len(epoch_counts[0])):
-        epoch_counts[0, i] = np.floor(
-            sum(down_sample10_hz[0, i * block_size : i * block_size + block_size])
-        )
-    del down_sample10_hz
-    gc.collect()
-    return epoch_counts
+        return out
+
+    @njit(parallel=True, fastmath=True)
+    def _trim_kernel(bpf):
+        """Threshold/trim in a single pass, LFE disabled."""
+        out = np.empty(bpf.shape, dtype=np.float32)
+        for c in range(bpf.shape[0]):
+            for i in prange(bpf.shape[1]):
+                v = abs(bpf[c, i])
+                out[c, i] = np.floor(min(v, 128.0)) * (v >= 4.0)
+        return out
+
+    @njit(parallel=True, fastmath=True)
+    def _trim_kernel_lfe(bpf):
+        """Threshold/trim in a single pass, LFE enabled."""
+        out = np.empty(bpf.shape, dtype=np.float32)
+        for c in range(bpf.shape[0]):
+            for i in prange(bpf.shape[1]):
+                v = min(abs(bpf[c, i]), 128.0)
+                out[c, i] = np.floor(v) - (v < 4.0) * (v >= 1.0)
+        return out
+
+    @njit(parallel=True, fastmath=True)
+    def _polyphase_resample(raw, L, M, a_fp, b_fp):
+        """Upsample by L, LPF and downsample by M each row of raw.
+
+        Gives the same result as zero filling to L times the length, running
+        the LPF and keeping every M-th sample, but only the kept samples are
+        stored.  The upsampled signal is zero except at multiples of L, so the
+        FIR part of the LPF is computed from raw directly.
+        """
+        n_up = raw.shape[1] * L
+        out = np.empty((raw.shape[0], (n_up + M - 1) // M))
+        gain = a_fp * L
+        for c in prange(raw.shape[0]):
+            y = 0.0
+            for k in range(n_up):
+                v = 0.0
+                if k % L == 0:
+                    v += raw[c, k // L]
+                if k >= 1 and (k - 1) % L == 0:
+                    v += raw[c, (k - 1) // L]
+                y = v * gain - b_fp * y
+                if k % M == 0:
+                    out[c, k // M] = y
+        return out
+
+
+def _factors(frequency: int) -> Tuple[int, int]:
+    return _FACTORS.get(frequency, (1, 1))
+
+
+def _load_extract_slow():
+    """Import the reference implementation, only needed when fast=False."""
+    if _INST_DIR is not None and _INST_DIR not in sys.path:
+        sys.path.insert(0, _INST_DIR)
+    from extract_reference import _extract_slow
+
+    return _extract_slow
 
 
 def _resample(
@@ -263,66 +203,84 @@ def _resample(
         The resampled_data
     """
     upsample_factor, downsample_factor = _factors(frequency)
-    raw = np.transpose(raw)
-
-    # Upsample by factor L.
-    m, n = raw.shape
-    upsample_data = np.zeros((m, upsample_factor * n), dtype=raw.dtype)
-    upsample_data[:, ::upsample_factor] = raw
-
-    if verbose:
-        print("_resample: Created upsample data", flush = True)
+    # one contiguous row per axis, so every later stage is a stride 1 sweep
+    raw = np.ascontiguousarray(np.transpose(raw), dtype=np.float64)
 
     pi = np.pi  # 3.1415926535897932385
     a_fp = pi / (pi + 2 * upsample_factor)
     b_fp = (pi - 2 * upsample_factor) / (pi + 2 * upsample_factor)
     up_factor_fp = upsample_factor
 
-    # raw doesn't need to be used after this
-    if frequency != 30:
+    if _HAS_NUMBA and frequency not in [30, 60, 90]:
+        # Polyphase: LPF and downsample without building the upsampled data.
+        if verbose:
+            print("_resample: Polyphase resampling data", flush = True)
+        downsample_data = _polyphase_resample(
+            raw,
+            upsample_factor,
+            downsample_factor,
+            a_fp,
+            b_fp,
+        )
         del raw
-    gc.collect()
-
-    # Allocate memory and then LPF.  LPF is only done at non
-    # integer multiples of 30 Hz. This LPF is garbage and does a
-    # poor job of attenuating higher frequencies that need to be
-    # rejected. This is the reason why there is aliasing which
-    # causes the "tail" on the epochs.
-    if frequency == 30 or frequency == 60 or frequency == 90:
-      print("lpf_data not needed", flush = True)
     else:
-      if verbose:
-          print("_resample: creating lpf data", flush = True)  
-      upsample_data = (a_fp * up_factor_fp) * (
-        upsample_data + np.roll(upsample_data, 1)
-      )
-      z = np.zeros(upsample_data.shape[0])
-      upsample_data = np.column_stack((z, upsample_data))
-      del z
-
-      for i in range(1, len(upsample_data[0])):
-         upsample_data[:, i] += -b_fp * upsample_data[:, i - 1]
-      # remove the zeros
-      upsample_data = upsample_data[:, 1:]
-    gc.collect()
-    if verbose:
-        print("_resample: Created lpf upsample data", flush = True)
+        # Upsample by factor L.
+        m, n = raw.shape
+        upsample_data = np.zeros((m, upsample_factor * n), dtype=raw.dtype)
+        upsample_data[:, ::upsample_factor] = raw
 
-    # Then allocate memory and downsample by factor M. Downsampled
-    # data is rounded to 3 decimal places before input into BPF.
-    if frequency == 30:
-        downsample_data = raw
-        del raw
-    else:
-        downsample_data = upsample_data[:, ::downsample_factor]
-    gc.collect()
+        if verbose:
+            print("_resample: Created upsample data", flush = True)
+
+        # raw doesn't need to be used after this
+        if frequency != 30:
+            del raw
+
+        # Allocate memory and then LPF.  LPF is only done at non
+        # integer multiples of 30 Hz. This LPF is garbage and does a
+        # poor job of attenuating higher frequencies that need to be
+        # rejected. This is the reason why there is aliasing which
+        # causes the "tail" on the epochs.
+        if frequency == 30 or frequency == 60 or frequency == 90:
+          print("lpf_data not needed", flush = True)
+        else:
+          if verbose:
+              print("_resample: creating lpf data", flush = True)  
+          lpf_gain = a_fp * up_factor_fp
+          lpf_data = np.empty_like(upsample_data)
+          lpf_data[:, 0] = upsample_data[:, 0] * lpf_gain
+          np.add(upsample_data[:, 1:], upsample_data[:, :-1], out=lpf_data[:, 1:])
+          lpf_data[:, 1:] *= lpf_gain
+          upsample_data = lpf_data
+          del lpf_data
+          # first order feedback, starting from a zero state
+          upsample_data = signal.lfilter(
+            np.array([1.0]), np.array([1.0, b_fp]), upsample_data, axis=-1
+          )
+        if verbose:
+            print("_resample: Created lpf upsample data", flush = True)
+
+        # Then allocate memory and downsample by factor M. Downsampled
+        # data is rounded to 3 decimal places before input into BPF.
+        if frequency == 30:
+            downsample_data = raw
+            del raw
+        else:
+            downsample_data = upsample_data[:, ::downsample_factor]
 
-    del upsample_data
-    gc.collect()
+        del upsample_data
     
     if verbose:
         print("_resample: Created downsample_data", flush = True)
-    downsample_data = np.round(downsample_data * 1000) / 1000
+    # Round in place when downsample_data is a buffer made here (e.g. the
+    # contiguous copy of raw at 30 Hz); a view may be the caller's raw, so
+    # only then is a new array allocated.
+    if downsample_data.base is None:
+        np.multiply(downsample_data, 1000.0, out=downsample_data)
+    else:
+        downsample_data = np.multiply(downsample_data, 1000.0)
+    np.round(downsample_data, out=downsample_data)
+    np.divide(downsample_data, 1000.0, out=downsample_data)
     if verbose:
         print("_resample: returning downsampled data", flush = True)
     return downsample_data
@@ -347,29 +305,25 @@ def _bpf_filter(
     """
     if verbose:
         print("_bpf_filter: Creating filter", flush = True)    
-    a = INPUT_COEFFICIENTS[0, :]
-    b = OUTPUT_COEFFICIENTS[0, :]
-    zi = signal.lfilter_zi(a, b)
-    zi = zi.reshape((1, -1))
-    if verbose:
-        print("_bpf_filter: Repeating filter", flush = True)    
-    zi = zi.repeat(downsample_data.shape[0], axis=0) * downsample_data[:, 0].reshape((-1, 1))
+    a = _A_NORM
+    b = _B_NORM
+    zi = _ZI * downsample_data[:, :1]
     
     if verbose:
         print("_bpf_filter: Filtering Data", flush = True)
-    bpf_data, _ = signal.lfilter(
-        a, 
-        b,
-        downsample_data,
-        zi=zi,
-    )
+    if _HAS_NUMBA:
+        downsample_data = np.ascontiguousarray(downsample_data, dtype=np.float64)
+        bpf_data = _iir9(downsample_data, zi)
+    else:
+        bpf_data, _ = signal.lfilter(
+            a, 
+            b,
+            downsample_data,
+            zi=zi,
+        )
 
     del downsample_data
-    gc.collect()
 
-    bpf_data = ((3.0 / 4096.0) / (2.6 / 256.0) * 237.5) * bpf_data
-    # 17.127404 is used in ActiLife and 17.128125 is used in
-    # firmware.
     return bpf_data
 
 
@@ -390,37 +344,41 @@ def _trim_data(
     Returns
     -------
     trim_data :
-        The trimmed/thresholded data
+        The trimmed/thresholded data.  These are whole counts between 0 and
+        128, so they are stored as float32 without any loss.
     """
     # then threshold/trim
     if verbose:
         print("Trimming Data", flush = True)
+    if _HAS_NUMBA:
+        bpf_data = np.asarray(bpf_data, dtype=np.float64)
+        if lfe_select:
+            return _trim_kernel_lfe(bpf_data)
+        return _trim_kernel(bpf_data)
+
     if lfe_select:
         min_count = 1
         max_count = 128 * 1
 
         trim_data = np.abs(bpf_data)
-        trim_data[(trim_data < min_count) & (trim_data >= 4)] = 0
-        trim_data[trim_data > max_count] = max_count
-        mask = (trim_data < 4) & (trim_data >= min_count)
-        trim_data[mask] = np.abs(trim_data[mask]) - 1
-        trim_data = np.floor(trim_data)
-        mask = []
+        np.clip(trim_data, 0, max_count, out=trim_data)
+        trim_data[(trim_data < 4) & (trim_data >= min_count)] -= 1
+        np.floor(trim_data, out=trim_data)
 
     else:
         min_count = 4
         max_count = 128
 
         trim_data = np.abs(bpf_data)
-        trim_data[trim_data < min_count] = 0
-        trim_data[trim_data > max_count] = max_count
-        trim_data = np.floor(trim_data)
-    return trim_data
+        np.clip(trim_data, 0, max_count, out=trim_data)
+        np.floor(trim_data, out=trim_data)
+        np.copyto(trim_data, 0.0, where=trim_data < min_count)
+    return trim_data.astype(np.float32)
 
 
 def _resample_10hz(
     trim_data: npt.NDArray[np.float_], verbose: bool
-) -> npt.NDArray[np.float64]:
+) -> npt.NDArray[np.float32]:
     """Resample the data.
 
     Parameters
@@ -437,9 +395,11 @@ def _resample_10hz(
     if verbose:
         print("Getting data back to 10Hz for accumulation", flush = True)
     # hackish downsample to 10 Hz
-    downsample_10hz = np.cumsum(trim_data, axis=-1, dtype=float)
-    downsample_10hz[:, 3:] = downsample_10hz[:, 3:] - downsample_10hz[:, :-3]
-    downsample_10hz = np.floor(downsample_10hz[:, 3 - 1 :: 3] / 3)
+    # non-overlapping means of 3 samples, dropping any incomplete block
+    n_axes, n_samples = trim_data.shape
+    n_samples = (n_samples // 3) * 3
+    downsample_10hz = trim_data[:, :n_samples].reshape(n_axes, n_samples // 3, 3)
+    downsample_10hz = np.floor(downsample_10hz.mean(axis=-1))
     return downsample_10hz
 
 
@@ -467,12 +427,13 @@ def _sum_counts(
         print("Summing epochs", flush = True)
     # Accumulator for epoch
     block_size = epoch_seconds * 10
-    epoch_counts = np.cumsum(downsample_10hz, axis=-1, dtype=float)
-
-    epoch_counts[:, block_size:] = (
-        epoch_counts[:, block_size:] - epoch_counts[:, :-block_size]
+    # non-overlapping sums of block_size samples, dropping any incomplete block
+    n_axes, n_samples = downsample_10hz.shape
+    n_samples = (n_samples // block_size) * block_size
+    epoch_counts = downsample_10hz[:, :n_samples].reshape(
+        n_axes, n_samples // block_size, block_size
     )
-    epoch_counts = np.floor(epoch_counts[:, block_size - 1 :: block_size])
+    epoch_counts = np.floor(epoch_counts.sum(axis=-1, dtype=float))
     return epoch_counts
 
 
@@ -508,22 +469,18 @@ def _extract(
       print("_resampling data", flush=True)  
     downsample_data = _resample(raw=raw, frequency=frequency, verbose=verbose)
     del raw
-    gc.collect()
     if verbose:
       print("_bpf_filtering data", flush=True)  
     bpf_data = _bpf_filter(downsample_data=downsample_data, verbose=verbose)
     del downsample_data
-    gc.collect()
     if verbose:
       print("_trim_data-ing data", flush=True)     
     trim_data = _trim_data(bpf_data=bpf_data, lfe_select=lfe_select, verbose=verbose)
     del bpf_data
-    gc.collect()
     if verbose:
       print("_resample_10hz-ing data", flush=True)      
     downsample_10hz = _resample_10hz(trim_data=trim_data, verbose=verbose)
     del trim_data
-    gc.collect()
 
     epoch_counts = _sum_counts(
         downsample_10hz=downsample_10hz, epoch_seconds=epoch_seconds, verbose=verbose
@@ -556,38 +513,8 @@ def get_counts(raw, freq: int, epoch: int, fast: bool = True, verbose: bool = Fa
     if fast:
         counts = _extract(raw, freq, False, epoch, verbose).transpose()
     else:
-        x_raw = raw[0 : len(raw), [0]]
-        y_raw = raw[0 : len(raw), [1]]
-        z_raw = raw[0 : len(raw), [2]]
-
-        if verbose:
-            print("Running extract for x", flush = True)
-        epoch_counts_x = _extract_slow(x_raw, freq, False, epoch, verbose)
-        if verbose:
-            print("Running extract for y", flush = True)
-        epoch_counts_y = _extract_slow(y_raw, freq, False, epoch, verbose)
-        if verbose:
-            print("Running extract for z", flush = True)
-        epoch_counts_z = _extract_slow(z_raw, freq, False, epoch, verbose)
-
-        if verbose:
-            print("Transposing and concatenating", flush = True)
-        # formatting matrix for output
-        x_counts_transposed = np.transpose(epoch_counts_x)
-        del epoch_counts_x
-        y_counts_transposed = np.transpose(epoch_counts_y)
-        del epoch_counts_y
-        z_counts_transposed = np.transpose(epoch_counts_z)
-        del epoch_counts_z
-        gc.collect()
-        
-        counts = np.concatenate(
-            (x_counts_transposed, y_counts_transposed, z_counts_transposed), 1
-        )
-        del x_counts_transposed
-        del y_counts_transposed
-        del z_counts_transposed
-        gc.collect()
+        _extract_slow = _load_extract_slow()
+        counts = _extract_slow(raw, freq, False, epoch, verbose).transpose()
 
     return counts.astype(int)
 
@@ -595,7 +522,14 @@ def get_counts(raw, freq: int, epoch: int, fast: bool = True, verbose: bool = Fa
 def get_counts_csv(file, freq: int, epoch: int, fast: bool = True, verbose: bool = False, time_column: str = None):
   if verbose:
     print("Reading in CSV", flush = True)
-  raw = pd.read_csv(file, skiprows=0)
+  usecols = ["X", "Y", "Z"]
+  if time_column is not None:
+    usecols = usecols + [time_column]
+  try:
+    raw = pd.read_csv(file, usecols=usecols, engine="pyarrow")
+  except (ImportError, ValueError):
+    # pyarrow is not installed, or pandas is too old for its engine
+    raw = pd.read_csv(file, usecols=usecols)
   if time_column is not None:
     ts = raw[time_column]
     ts = pd.to_datetime(ts)
@@ -603,18 +537,17 @@ def get_counts_csv(file, freq: int, epoch: int, fast: bool = True, verbose: bool
     ts = ts.dt.round(time_freq)
     ts = ts.unique()
     ts = pd.DataFrame(ts, columns=[time_column])
-  raw = raw[["X", "Y", "Z"]]
   if verbose:
     print("Converting to array", flush = True)  
-  raw = np.array(raw)
-  gc.collect()
+  raw = raw[["X", "Y", "Z"]].to_numpy(dtype=np.float64, copy=False)
   if verbose:
     print("Getting Counts", flush = True)    
   counts = get_counts(raw, freq = freq, epoch = epoch, fast = fast, verbose = verbose)
   del raw
-  gc.collect()
   counts = pd.DataFrame(counts, columns = ['X','Y','Z'])
-  counts["AC"] = ((counts["X"]* 1.0) ** 2.0 + (counts["Y"]*1.0)  ** 2.0 + (counts["Z"] * 1.0) **2.0) ** 0.5
+  xyz = counts[["X", "Y", "Z"]].to_numpy(dtype=np.float64)
+  counts["AC"] = np.sqrt(np.einsum("ij,ij->i", xyz, xyz))
+  del xyz
   if time_column is not None:
     ts = ts[0:counts.shape[0]]
     counts = pd.concat([ts, counts], axis=1)
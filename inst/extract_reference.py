@@ -0,0 +1,187 @@
+"""Reference implementation for extracting counts.
+
+This is only imported by ``extract.get_counts`` when ``fast=False``.
+"""
+import numpy as np
+from numpy import typing as npt
+from scipy import signal
+
+from extract import INPUT_COEFFICIENTS, OUTPUT_COEFFICIENTS, _factors
+
+
+def _extract_slow(
+    raw: npt.NDArray[np.float_],
+    frequency: int,
+    lfe_select: bool,
+    epoch: int,
+    verbose: bool,
+):
+    """Extract actigraphy counts from accelerometer data.
+
+    This implementation is purposefully only using basic python function to allow
+    easier understanding of the algorithm.
+
+    Parameters
+    ----------
+    raw
+        Matrix containing raw data, one column per axis
+    frequency
+        sample frequency of raw data (Hz)
+    lfe_select
+        False for regular trimming (LFE disabled), True to allow more noise
+        (LFE enabled)
+    epoch
+        Epoch duration in seconds
+
+    Returns
+    -------
+    ndarray containing epoch counts
+    """
+    upsample_factor, downsample_factor = _factors(frequency)
+    raw = np.transpose(raw)
+    n_axes = raw.shape[0]
+    # Allocate memory and upsample by factor L.
+    upsample_data = np.zeros((n_axes, int(len(raw[0]) * upsample_factor)))
+
+    for i in range(len(raw[0])):
+        upsample_data[:, i * upsample_factor] = raw[:, i]
+
+    # Allocate memory and then LPF.  LPF is only done at non integer multiples of 30 Hz.
+    # This LPF is garbage and does a poor job of attenuating higher frequencies that
+    # need to be rejected.  This is the reason why there is aliasing which causes the
+    # "tail" on the epochs.
+
+    # lpf_upsample_data = np.zeros((1, len(upsample_data[0])))
+    if frequency not in [30, 60, 90]:
+        lpf_upsample_data = np.zeros(
+            (n_axes, int(len(raw[0]) * upsample_factor + 1))
+        )
+
+    pi = np.pi  # 3.1415926535897932385
+    pi_fp = pi
+    a_fp = pi_fp / (pi + 2 * upsample_factor)
+    b_fp = (pi - 2 * upsample_factor) / (pi + 2 * upsample_factor)
+    l_fp = upsample_factor
+
+    if verbose:
+        print("Upsampling data", flush = True)
+    if frequency == 30 or frequency == 60 or frequency == 90:
+        lpf_upsample_data = upsample_data
+    else:
+        for i in range(1, len(lpf_upsample_data[0])):
+            lpf_upsample_data[:, i] = (
+                (a_fp * l_fp) * upsample_data[:, i - 1]
+                + (a_fp * l_fp) * upsample_data[:, i - 2]
+                - b_fp * lpf_upsample_data[:, i - 1]
+            )
+
+    if frequency not in [30, 60, 90]:
+        lpf_upsample_data = lpf_upsample_data[:, 1:]
+
+    # Then allocate memory and downsample by factor M.  Downsampled data is rounded to 3
+    # decimal places before input into BPF.
+
+    if verbose:
+        print("Downsampling data", flush = True)
+    if frequency == 30:
+        down_sample_data = raw
+    else:
+        down_sample_data = np.empty(
+            (
+                n_axes,
+                int(np.floor(len(raw[0]) * upsample_factor / downsample_factor)),
+            )
+        )
+        for i in range(len(down_sample_data[0])):
+            down_sample_data[:, i] = lpf_upsample_data[:, i * downsample_factor]
+    del raw
+    del lpf_upsample_data
+    
+    down_sample_data = np.round(down_sample_data * 1000) / 1000
+
+    bpf_data = np.empty((n_axes, len(down_sample_data[0])))
+
+    shift_reg_in = np.empty((n_axes, 9))
+    shift_reg_out = np.empty((n_axes, 9))
+
+    if verbose:
+        print("Filtering data", flush = True)
+    # Start the filter at steady state for the first sample, as if it had
+    # been charged up on it.  The input registers all hold that sample and
+    # the output registers hold the filter's steady state response to it.
+    zi = signal.lfilter_zi(INPUT_COEFFICIENTS[0], OUTPUT_COEFFICIENTS[0])
+    shift_reg_in[:] = down_sample_data[:, [0]]
+    shift_reg_out[:] = (INPUT_COEFFICIENTS[0, 0] + zi[0]) * down_sample_data[:, [0]]
+
+    for j in range(len(bpf_data[0])):
+        shift_reg_in[:, 1:9] = shift_reg_in[:, 0:8]
+        shift_reg_in[:, 0] = down_sample_data[:, j]
+        zeros_comp = np.sum(INPUT_COEFFICIENTS[[0], 0:8] * shift_reg_in[:, 0:8], axis=1)
+        poles_comp = np.sum(OUTPUT_COEFFICIENTS[[0], 1:8] * shift_reg_out[:, 0:7], axis=1)
+        bpf_data[:, j] = zeros_comp - poles_comp
+        shift_reg_out[:, 1:9] = shift_reg_out[:, 0 : (9 - 1)]
+        shift_reg_out[:, 0] = zeros_comp - poles_comp
+    del down_sample_data
+
+
+    bpf_data = (
+        (3.0 / 4096.0) / (2.6 / 256.0) * 237.5
+    ) * bpf_data  # 17.127404 is used in ActiLife and 17.128125 is used in firmware.
+
+    if verbose:
+        print("Threshold/trimming data", flush = True)
+    # then threshold/trim
+    trim_data = np.empty((n_axes, len(bpf_data[0])))
+
+    if lfe_select:
+        min_count = 1
+        max_count = 128 * 1
+
+        for c in range(n_axes):
+            for i in range(len(bpf_data[0])):
+                if abs(bpf_data[c, i]) > max_count:
+                    trim_data[c, i] = max_count
+                elif abs(bpf_data[c, i]) < min_count:
+                    trim_data[c, i] = 0
+                elif abs(bpf_data[c, i]) < 4:
+                    trim_data[c, i] = np.floor(abs(bpf_data[c, i])) - 1
+                else:
+                    trim_data[c, i] = np.floor(abs(bpf_data[c, i]))  # floor
+    else:
+        min_count = 4
+        max_count = 128
+
+        for c in range(n_axes):
+            for i in range(len(bpf_data[0])):
+                if abs(bpf_data[c, i]) > max_count:
+                    trim_data[c, i] = max_count
+                elif abs(bpf_data[c, i]) < min_count:
+                    trim_data[c, i] = 0
+                else:
+                    trim_data[c, i] = np.floor(abs(bpf_data[c, i]))  # floor
+
+    if verbose:
+        print("Getting data back to 10Hz for accumulation", flush = True)
+    del bpf_data
+    # hackish downsample to 10 Hz, mean of each block of 3 samples
+    n_samples = (len(trim_data[0]) // 3) * 3
+    down_sample10_hz = np.floor(
+        np.nanmean(
+            trim_data[:, :n_samples].reshape(n_axes, n_samples // 3, 3), axis=-1
+        )
+    )  # floor
+    del trim_data
+
+    # Accumulator for epoch
+    block_size = epoch * 10
+    n_samples = (len(down_sample10_hz[0]) // block_size) * block_size
+
+    if verbose:
+        print("Summing epochs", flush = True)
+    epoch_counts = np.floor(
+        down_sample10_hz[:, :n_samples]
+        .reshape(n_axes, n_samples // block_size, block_size)
+        .sum(axis=-1)
+    )
+    del down_sample10_hz
+    return epoch_counts